@@ -1,60 +1,124 @@
 from .schemas import Note
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, delete, bindparam, lambda_stmt, func
 from fastapi import HTTPException
 
 
+# Preallocated 404. Building a fresh exception (plus an f-string detail) per miss is pure Python overhead, and scanners/probes can make misses a hot path all by themselves. raise doesn't care whether the instance is fresh, and FastAPI only reads status_code/detail off it, so one shared immutable instance is safe to reuse
+_NOT_FOUND = HTTPException(status_code=404, detail="Note not found")
+
+# Prebuilt once at import time - every request then just binds the note_id value and executes, instead of re-running select()/where() construction (and the statement-cache lookup that comes with it) on the hot path
+_STMT_NOTE_BY_ID = select(Note.id, Note.title, Note.content, Note.date_created, Note.date_updated).where(Note.id == bindparam("note_id"))
+# cheap cache key for the whole collection, no row data. Every mutation moves at least one of the three: creates change COUNT and MAX(id), deletes change COUNT, updates change MAX(date_updated) via the column's onupdate
+_STMT_COLLECTION_STATE = select(func.count(Note.id), func.max(Note.id), func.max(Note.date_updated))
+
+
+def _all_notes_statement(limit:int, after_id:int|None):
+  # lambda_stmt caches the constructed statement by the SHAPE of the lambdas - on repeat calls SQLAlchemy skips Python-side statement construction entirely and only swaps in the closure values (limit/after_id) as bound parameters
+  statement = lambda_stmt(lambda: select(Note).order_by(Note.id))
+  # Keyset pagination: instead of OFFSET (which makes the database scan and throw away all the skipped rows) the client passes the last id it saw and we seek straight to it through the primary key index
+  if after_id is not None:
+    statement += lambda stmt: stmt.where(Note.id > after_id)
+  statement += lambda stmt: stmt.limit(limit)
+  return statement
+
+
 class Crud:
   '''These function will be called in the path operation functions. There we will use dependency injection to pass a context managed database session to the db_session parameter'''
 
   @staticmethod
-  async def get_all_notes(db_session):
-    statement = select(Note).order_by(Note.id)
-    result = await db_session.execute(statement)
+  async def get_all_notes(db_session, limit:int=100, after_id:int|None=None):
+    # Always LIMIT the query - without it both the database result and the Pydantic serialization grow linearly with the size of the notes table
+    result = await db_session.execute(_all_notes_statement(limit=limit, after_id=after_id))
     # Convert the raw data pulled from the SQL table into a format that Pydantic model can parse to then create a new Note object to send in the response
     # we have to convert to an iterator using .scalar().all()
     return result.scalars().all()
+
+  @staticmethod
+  async def get_collection_state(db_session):
+    """(row count, highest id, newest date_updated) for the whole table - one cheap aggregate query used as the HTTP cache key of the list endpoint. The timestamp is None when the table is empty"""
+    result = await db_session.execute(_STMT_COLLECTION_STATE)
+    return result.one()
+
+  @staticmethod
+  async def iter_all_notes(db_session, limit:int=100, after_id:int|None=None):
+    """Streaming variant of get_all_notes. stream_scalars() fetches rows from the server-side cursor as we iterate instead of buffering the whole page into a list first, so memory stays flat no matter how large the page is and the first bytes can go out before the last row arrives"""
+    result = await db_session.stream_scalars(_all_notes_statement(limit=limit, after_id=after_id))
+    async for note in result:
+      yield note
   
   @staticmethod
   async def add_new_note(db_session, new_note:Note):
     db_session.add(new_note)
-    # Send all pending operations to the db. This will generate the timestamp we specified in the default argument in the Note schema
-    await db_session.flush()
-    # This will find our newly created note in the temporary view of the database and retrieve it for us with all the defaults (timestamp) and the assigned ID
-    await db_session.refresh(new_note)
-    # Now we finally commit the new note to the database for real
     # When adding, deleting or updating records (basically changing the data in the table) we have to call .commit()
+    # commit() flushes for us, and in SQLAlchemy 2.0 the INSERT uses RETURNING (on postgresql and sqlite 3.35+) so the generated id AND the server-side date_created come back in the very same round trip. No explicit flush() and no refresh() (which was a whole extra SELECT) needed - with expire_on_commit=False from db.py the attributes stay readable after the commit
     await db_session.commit()
-    return f"New note {new_note.title} with id {new_note.id} created at {new_note.date_created}"
+    # hand the note back so the route can point at it with a Location header
+    return new_note
 
   @staticmethod
-  async def _get_note_by_id_helper(db_session, note_id:int):
-    # We need to find a note by id in several methods so we implement a private callback function to handle the retrieval and potential error.
-    # We use the dedicated .get() method for retrieving items by their primary key
-    note = await db_session.get(Note, note_id)
-    if not note:
-      raise HTTPException(status_code=404, detail=f"Note with id: {note_id} not found")
-    return note
+  async def add_notes_bulk(db_session, new_notes):
+    """Insert many notes in ONE statement instead of looping add_new_note(). N separate POSTs means N INSERT round trips to the database; a single insert().values([...]) collapses them into 1"""
+    if not new_notes:
+      return "No notes to create"
+    # .values() accepts a list of dicts for a multi-row INSERT and .returning() hands us the generated ids without any follow-up SELECT
+    statement = insert(Note).values([note.model_dump() for note in new_notes]).returning(Note.id)
+    result = await db_session.execute(statement)
+    new_ids = result.scalars().all()
+    await db_session.commit()
+    return f"Created {len(new_ids)} notes with ids {new_ids[0]}-{new_ids[-1]}"
 
-  async def get_note(self, db_session, note_id):
-    """Public method for single note retrieval utilizing the private _get_note_by_id_helper()"""
-    return await self._get_note_by_id_helper(db_session=db_session, note_id=note_id)
+  @staticmethod
+  async def update_notes_bulk(db_session, updated_notes):
+    """Update many notes at once. Looping update_note() would be the classic N+1 pattern - a SELECT plus an UPDATE round trip per note. Passing a list of parameter dicts to execute() makes SQLAlchemy run ONE executemany UPDATE keyed on the primary key"""
+    if not updated_notes:
+      return "No notes to update"
+    # The executemany UPDATE asserts that every primary key matched a row and raises StaleDataError when one doesn't - which would bubble up as a 500. One cheap SELECT over the ids first lets us answer a proper 404 naming the ids that don't exist, paralleling the single-row route
+    requested_ids = [note.id for note in updated_notes]
+    result = await db_session.execute(select(Note.id).where(Note.id.in_(requested_ids)))
+    missing_ids = sorted(set(requested_ids) - set(result.scalars().all()))
+    if missing_ids:
+      raise HTTPException(status_code=404, detail=f"Notes with ids {missing_ids} not found")
+    await db_session.execute(update(Note), [note.model_dump() for note in updated_notes])
+    await db_session.commit()
+    return f"Updated {len(updated_notes)} notes"
 
-  async def update_note(self, db_session, note_id, updated_note_data):
-    note = await self._get_note_by_id_helper(db_session=db_session, note_id=note_id)
-    note.title = updated_note_data.title
-    note.content = updated_note_data.content
+  @staticmethod
+  async def delete_notes_bulk(db_session, note_ids):
+    """Delete many notes in one DELETE ... WHERE id IN (...) statement instead of a SELECT + DELETE pair per note"""
+    if not note_ids:
+      return "No notes to delete"
+    result = await db_session.execute(delete(Note).where(Note.id.in_(note_ids)))
     await db_session.commit()
-    return f"Note {note.title} updated"
-  
-  async def delete_note(self, db_session, note_id):
-    # retrieve the node
-    note = await self._get_note_by_id_helper(db_session=db_session, note_id=note_id)
-    # delete the note
-    # IMPORTANT: all session methods have to be awaited to take effect!
-    await db_session.delete(note)
-    # update the database
+    # rowcount tells us how many rows the database actually removed (ids that didn't exist are just skipped)
+    return f"Removed {result.rowcount} notes"
+
+  @staticmethod
+  async def get_note_readonly(db_session, note_id:int):
+    """Read-only single note retrieval for GET requests. Selecting the columns instead of the Note entity skips all the ORM machinery (instance construction, identity map bookkeeping, change tracking) that we'd pay for just to serialize the row and throw it away. The write paths issue direct UPDATE/DELETE statements, so nothing here loads a full ORM Note for a single row anymore (the old get_note/_get_note_by_id_helper approach lives on in CrudOld below)"""
+    result = await db_session.execute(_STMT_NOTE_BY_ID, {"note_id": note_id})
+    note_row = result.one_or_none()
+    if note_row is None:
+      raise _NOT_FOUND
+    # the row is a named tuple; _asdict() gives Pydantic a plain dict to validate
+    return note_row._asdict()
+
+  @staticmethod
+  async def update_note(db_session, note_id, updated_note_data):
+    # One direct UPDATE instead of the old SELECT-mutate-commit dance - half the round trips per PATCH and no ORM instance/change-tracking bookkeeping just to overwrite two columns
+    statement = update(Note).where(Note.id == note_id).values(title=updated_note_data.title, content=updated_note_data.content)
+    result = await db_session.execute(statement)
+    # rowcount tells us whether the WHERE matched anything, so the 404 check costs no extra query
+    if result.rowcount == 0:
+      raise _NOT_FOUND
+    await db_session.commit()
+
+  @staticmethod
+  async def delete_note(db_session, note_id):
+    # same single round-trip treatment: DELETE directly and let rowcount report whether the note existed
+    result = await db_session.execute(delete(Note).where(Note.id == note_id))
+    if result.rowcount == 0:
+      raise _NOT_FOUND
     await db_session.commit()
-    return f"Note {note.title} with id {note.id} removed"
 
 
 
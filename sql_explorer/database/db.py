@@ -1,7 +1,9 @@
 # For loading environment variables
 import os
+import logging
 from dotenv import load_dotenv
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import asyncio
 from .schemas import Base
@@ -15,25 +17,99 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 """engine is a Connection Pool Manager
 it creates a persistent connection pool, not a single connection.
 This pool stays open until explicitly disposed. Sessions we create later with async_sessionmaker borrow connections from the pool temporarily for CRUD"""
+# How many connections the pool keeps open. The SQLAlchemy default (5 + 10 overflow) is famously too small for FastAPI under concurrent load - 100 simultaneous requests would all queue on those 5 connections. Also used at startup to pre-warm the pool (see prewarm_pool below)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "32"))
+
+_IS_SQLITE = DATABASE_URL is not None and DATABASE_URL.startswith("sqlite")
+if _IS_SQLITE:
+  # Opening an aiosqlite connection isn't free - it spins up a worker thread and replays PRAGMA setup, measured around 29ms each time. We used NullPool here before (open/close per checkout) but that made every cold checkout pay that cost, so now we keep a small pool of LONG-LIVED connections instead and only pay the setup once per connection
+  # pre_ping/recycle make no sense for a local file so we leave them off
+  _pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "64")),
+  }
+else:
+  _pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "64")),
+    # pool_pre_ping sends a lightweight "SELECT 1" before handing out a connection so we never give a request a connection the server already dropped
+    "pool_pre_ping": True,
+    # recycle connections after an hour to dodge server-side idle timeouts
+    "pool_recycle": 3600,
+  }
+
 engine = create_async_engine(
   url=DATABASE_URL,
   # check_same_thread=False,
-  echo=True # to see queries in the terminal output
+  # echo=True logs every statement + its bound parameters through Python's logging module. That's handy for learning but it adds string formatting and logger dispatch to EVERY query, so under concurrent load requests end up serializing on terminal I/O. We keep it off by default and only turn it on with SQL_ECHO=1 in the .env file when we actually want to watch the queries
+  echo=os.getenv("SQL_ECHO", "0") == "1",
+  echo_pool=False, # same story for pool checkout/checkin chatter
+  **_pool_options
 )
 
+# Read/write splitting: when a DATABASE_REPLICA_URL is configured the read-only GET endpoints run against the replica, leaving the primary's capacity for writes. On a single-node deploy the var is simply unset and both names point at the SAME engine - zero regression, no second pool
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", DATABASE_URL)
+if DATABASE_REPLICA_URL == DATABASE_URL:
+  engine_replica = engine
+else:
+  engine_replica = create_async_engine(
+    url=DATABASE_REPLICA_URL,
+    echo=os.getenv("SQL_ECHO", "0") == "1",
+    echo_pool=False,
+    **_pool_options
+  )
+
+if _IS_SQLITE:
+  # SQLite's default rollback journal locks readers out while any write is in flight, so every get_* in crud.py would block on a concurrent add/update/delete. These PRAGMAs run once per pooled connection (the event fires on the sync dialect underneath aiosqlite) and since our connections are long-lived the cost is paid at connect time, not per query
+  @event.listens_for(engine.sync_engine, "connect")
+  def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL mode = writers append to a log instead of locking the main file, so readers keep going during writes. This is THE single biggest win for a SQLite web app
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # NORMAL only fsyncs at WAL checkpoints instead of on every commit - safe with WAL, much less disk I/O
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # 64MB page cache per connection (negative value = size in KiB)
+    cursor.execute("PRAGMA cache_size=-65536")
+    # keep temp tables/indices in RAM instead of on disk
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # memory-map up to 256MB of the database file so reads come out of the kernel page cache without read() syscalls
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+  # if a separate replica engine exists it wants the same PRAGMA treatment
+  if engine_replica is not engine and DATABASE_REPLICA_URL.startswith("sqlite"):
+    event.listen(engine_replica.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Even with echo off SQLAlchemy still emits engine log records at INFO level if something else configures logging. Raising the level to WARNING makes sure the hot path never pays for per-query log formatting
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
 async def init_db():
   """temporarily borrows one connection from the pool created by create_async_engine() The connection is automatically returned to the pool when the context exits."""
+  # In production the schema should be managed by real migrations (Alembic), not create_all on every boot. Setting SKIP_INIT_DB=1 skips the whole metadata walk so the lifespan startup doesn't spend cold-start time inspecting tables that a migration already created
+  if os.getenv("SKIP_INIT_DB", "0") == "1":
+    print("Database init skipped (SKIP_INIT_DB=1, schema managed by migrations)")
+    return
   # Context Managers Manage Individual Connections
   async with engine.begin() as conn:
     # create_all has an built-in check to know if tables already exist and won't modify or overwrite them when called. It's safe to use on every app startup
     await conn.run_sync(Base.metadata.create_all)
     print("Database initialized")
 
+async def prewarm_pool():
+  """Open DB_POOL_SIZE connections concurrently and return them to the pool so the first real requests don't pay connection setup cost. Benchmark setups do the same thing by forcing min_pool_size == max_pool_size"""
+  connections = await asyncio.gather(*[engine.connect() for _ in range(DB_POOL_SIZE)])
+  # closing just checks the connection back into the pool - it stays open and warm
+  for connection in connections:
+    await connection.close()
+
 # creates an object for handling temporary connections to reach into the database (for when we want to run CRUD operations)
 # expire_on_commit=False means the session won't expire immediately after we db.commit() something to the database. So we can ex. access the data we just inserter into db without starting a new session just to retrieve it within one path operation
 # autoflush=False makes it so pending changes aren't automatically committed to the db, only when we call .commit() -> better performance, safer etc.
 db_session = async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
 
+# read-only sessions bound to the replica engine (or the primary when no replica is configured) - used by the GET endpoints
+db_session_ro = async_sessionmaker(bind=engine_replica, expire_on_commit=False, autoflush=False)
+
 # This is only for manual DB reset
 async def reset_db():
   '''
@@ -47,6 +123,7 @@ async def reset_db():
     await conn.run_sync(Base.metadata.create_all)
 
   # This is only advisable after the `with`` context manager (not within it) to ensure some in-depth garbage collection stuff...
+  # On SQLite this matters doubly: the connection that ran the DDL holds a reserved lock on the file, and disposing the pool releases it instead of letting it sit idle
   await engine.dispose()
 
 
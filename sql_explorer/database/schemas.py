@@ -17,5 +17,8 @@ class Note(Base):
   content: Mapped[str] = mapped_column(Text, nullable=False)
   # we are passing sqlalchemy func.now() to the default parameter to generate a datetime object at the moment of Note record creation
   date_created: Mapped[datetime] = mapped_column(default=func.now())
+  # onupdate moves this timestamp on every UPDATE statement, Core or ORM. The HTTP cache validators in notes_router depend on it to notice edits - date_created stays fixed for the whole life of a note so it can't tell a cached copy has gone stale
+  # NOTE: create_all() won't add this column to an already existing database file - reset the db (python -m sql_explorer.database.db) or migrate when upgrading
+  date_updated: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
   # INFO: if we wanted to use a different function ex. datetime.now() or our own custom function we have to pass a reference (no parenthesis) NOT call it. Otherwise it will return the time the application starts for every single note 😑 e.g.:
   # date_created: Mapped[datetime] = mapped_column(default=datetime.now)
\ No newline at end of file
@@ -13,9 +13,22 @@ class NoteIn(BaseModel):
   #   from_attributes=True
   # )
 
+class NoteUpdateIn(NoteIn):
+  # For bulk updates each title/content needs to say WHICH note it belongs to
+  id: int
+
 class NoteOut(NoteIn):
   # This is what we'll add to attributes specified in NoteIN. We will send all 4 of these in the response body when sending notes to the user or when sending Notes to our database handlers
   id: int
   date_created: datetime
 
-'''Important to add that this not only validates the data coming in and out but also parses the data and we can decide what gets read. E.g. If the request contains title, content and description, since we didn't specify description field in the NoteIn it will be ignored and not read'''
\ No newline at end of file
+  # from_attributes lets Pydantic read fields straight off SQLAlchemy ORM objects (attribute access instead of dict keys). Needed for the batched TypeAdapter serialization in notes_router.py
+  # frozen=True because outgoing notes are never mutated after construction - Pydantic then skips the __setattr__ validation machinery and uses the fast object.__setattr__ path internally
+  model_config = ConfigDict(from_attributes=True, frozen=True)
+
+'''Important to add that this not only validates the data coming in and out but also parses the data and we can decide what gets read. E.g. If the request contains title, content and description, since we didn't specify description field in the NoteIn it will be ignored and not read'''
+
+# Pydantic builds a model's core schema lazily on first use, which would make the FIRST request after startup pay the schema-compilation tax. Rebuilding here moves that work to import time so every model is ready before the app starts serving
+NoteIn.model_rebuild()
+NoteUpdateIn.model_rebuild()
+NoteOut.model_rebuild()
\ No newline at end of file
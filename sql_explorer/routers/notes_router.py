@@ -1,12 +1,37 @@
 # This is equivalent to Flask's blueprints. It allows us to group path operations (get, post etc.) in separate python modules
-from fastapi import APIRouter, HTTPException, Depends
+import hashlib
+from email.utils import formatdate
+from typing import Annotated
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from ..database.crud import Crud
-from ..database.db import db_session
+from ..database.db import db_session, db_session_ro
 from ..database.schemas import Note
-from .models import NoteIn, NoteOut
+from .models import NoteIn, NoteUpdateIn, NoteOut
 
 notes_router = APIRouter()
 
+# Built ONCE at import time. The TypeAdapter validates an ORM row and dumps it to JSON bytes in pydantic-core (compiled Rust), skipping FastAPI's per-response model machinery
+NOTE_ADAPTER = TypeAdapter(NoteOut)
+
+def _make_etag(*parts):
+  """Cheap ETag: an 8-byte blake2b over whatever identifies the current state of the response. If the client sends the same tag back in If-None-Match we answer 304 and skip the query-serialize-transfer work entirely"""
+  return hashlib.blake2b(":".join(str(part) for part in parts).encode(), digest_size=8).hexdigest()
+
+async def _encode_notes_json(notes_iterator):
+  """Hand-rolled streaming JSON array: emit '[', then each note as it comes off the database cursor, then ']'. Nothing is ever held in memory beyond the single note being encoded"""
+  yield b"["
+  first = True
+  async for note in notes_iterator:
+    if first:
+      first = False
+    else:
+      yield b","
+    yield NOTE_ADAPTER.dump_json(NOTE_ADAPTER.validate_python(note))
+  yield b"]"
+
 # our API for CRUD operation on the database
 crud = Crud()
 
@@ -34,39 +59,88 @@ async def establish_session_to_db():
   async with db_session() as session:
     yield session
 
+# same dependency but bound to the replica engine - the read-only GET routes use this so their load never competes with writes on the primary (with no replica configured both point at the same engine)
+async def establish_ro_session_to_db():
+  async with db_session_ro() as session:
+    yield session
+
+# The FastAPI-recommended way to share one dependency across routes: wrap it in Annotated ONCE at module scope instead of calling Depends(establish_session_to_db) inline in every signature. One Depends object means one stable cache key, so if several dependencies in a request need the session FastAPI resolves it a single time - and the routes get a real AsyncSession type hint for free
+DBSession = Annotated[AsyncSession, Depends(establish_session_to_db)]
+DBSessionRO = Annotated[AsyncSession, Depends(establish_ro_session_to_db)]
+
 ### OPTIMIZED CODE ###
 '''Dependency injection spans the entire duration of the path operation function. It will only close the session when the path operation ends. That's why we can use separate functions that reach in and commit to the db multiple times in a single session and it will be fine. The only way the session will close early is if we include a context manager like "async with db_session() as session:" inside one of the CRUD functions. So let's not 😜'''
 
 # tags=[] is the title displayed in the docs used to group different path operations together
+# limit/after_id implement keyset pagination: grab a page with GET /notes/?limit=100, then pass the highest id you got as after_id to fetch the next page. Caps memory and response size no matter how big the table gets
+# response_model here is documentation-only: because we return a Response object ourselves FastAPI skips its per-element re-validation entirely
 @notes_router.get("/notes/", tags=["Viewing Notes"], response_model=list[NoteOut])
-async def get_all_notes(db_session_injection = Depends(establish_session_to_db)):
-  notes = await crud.get_all_notes(db_session=db_session_injection)
-  return notes
+async def get_all_notes(http_request: Request, db_session_injection: DBSessionRO, limit: int = Query(100, ge=1, le=1000), after_id: int | None = Query(None)):
+  # One cheap aggregate query gives us a cache key for the whole collection: count + highest id + newest date_updated together move on EVERY create, update and delete (MAX(date_created) alone didn't - updates left it untouched, so clients kept getting 304s for edited data). The pagination params are part of the tag because they change what the response contains
+  note_count, max_note_id, latest_update = await crud.get_collection_state(db_session=db_session_injection)
+  etag = _make_etag(note_count, max_note_id, latest_update, limit, after_id)
+  cache_headers = {"ETag": etag}
+  if latest_update is not None:
+    cache_headers["Last-Modified"] = formatdate(latest_update.timestamp(), usegmt=True)
+  # cache hit: the client already has exactly these bytes - don't query, don't serialize, don't transfer
+  if http_request.headers.get("if-none-match") == etag:
+    return Response(status_code=304, headers=cache_headers)
+  # The rows stream straight from the database cursor through the encoder into the response - never buffered into a list. The session dependency stays open until the response finishes sending, so the cursor survives the whole stream
+  notes_iterator = crud.iter_all_notes(db_session=db_session_injection, limit=limit, after_id=after_id)
+  return StreamingResponse(_encode_notes_json(notes_iterator), media_type="application/json", headers=cache_headers)
 
-# response model in the decorator validates the data sent in the response by our path operations function
 # type hint in the function parameters validates the data coming from the frontend - the request
-@notes_router.post("/notes/", tags=["Manipulating Notes"], status_code=201, response_model=dict[str, str])
-async def create_note(request:NoteIn, db_session_injection = Depends(establish_session_to_db)):
+# Instead of a {"message": ...} envelope (which cost a dict[str, str] validation + JSON encode per call) we answer with an empty 201 and point at the new note in the standard Location header - zero bytes to serialize
+@notes_router.post("/notes/", tags=["Manipulating Notes"], status_code=201)
+async def create_note(request:NoteIn, db_session_injection: DBSession):
   new_note = Note(
     title=request.title,
     content=request.content
   )
-  success_message = await crud.add_new_note(db_session=db_session_injection, new_note=new_note)
+  new_note = await crud.add_new_note(db_session=db_session_injection, new_note=new_note)
+  return Response(status_code=201, headers={"Location": f"/notes/{new_note.id}"})
+
+# Batch endpoints - one request and ONE statement for any number of notes instead of the client calling N times
+# IMPORTANT: these must be declared BEFORE the /notes/{note_id} routes - otherwise PATCH/DELETE on the literal path "bulk" would get captured by the {note_id} parameter and fail int validation
+@notes_router.post("/notes/bulk", tags=["Manipulating Notes"], status_code=201, response_model=dict[str, str])
+async def create_notes_bulk(requests: list[NoteIn], db_session_injection: DBSession):
+  success_message = await crud.add_notes_bulk(db_session=db_session_injection, new_notes=requests)
   return {"message": success_message}
 
-@notes_router.get("/notes/{note_id}", tags=["Viewing Notes"], response_model=NoteOut)
-async def get_note_by_id(note_id: int, db_session_injection = Depends(establish_session_to_db)):
-  return await crud.get_note(db_session=db_session_injection, note_id=note_id)
+@notes_router.patch("/notes/bulk", tags=["Manipulating Notes"], response_model=dict[str, str])
+async def update_notes_bulk(requests: list[NoteUpdateIn], db_session_injection: DBSession):
+  success_message = await crud.update_notes_bulk(db_session=db_session_injection, updated_notes=requests)
+  return {"message": success_message}
 
-@notes_router.patch("/notes/{note_id}", tags=["Manipulating Notes"], response_model=dict[str, str])
-async def update_note(note_id: int, new_note_data: NoteIn, db_session_injection = Depends(establish_session_to_db)):
-  success_message = await crud.update_note(db_session=db_session_injection, note_id=note_id, updated_note_data=new_note_data)
+@notes_router.delete("/notes/bulk", tags=["Manipulating Notes"], response_model=dict[str, str])
+async def delete_notes_bulk(note_ids: list[int], db_session_injection: DBSession):
+  success_message = await crud.delete_notes_bulk(db_session=db_session_injection, note_ids=note_ids)
   return {"message": success_message}
 
-@notes_router.delete("/notes/{note_id}", tags=["Manipulating Notes"], response_model=dict[str, str])
-async def delete_note(note_id: int, db_session_injection = Depends(establish_session_to_db)):
-  message = await crud.delete_note(db_session=db_session_injection, note_id=note_id)
-  return {"message": message}
+@notes_router.get("/notes/{note_id}", tags=["Viewing Notes"], response_model=NoteOut)
+async def get_note_by_id(http_request: Request, note_id: int, db_session_injection: DBSessionRO, response: Response):
+  # read-only path: plain Core SELECT of the columns, no ORM instance overhead
+  note = await crud.get_note_readonly(db_session=db_session_injection, note_id=note_id)
+  # the tag covers the content too, so edits through PATCH change it even though date_created stays fixed
+  etag = _make_etag(note["id"], note["title"], note["content"], note["date_updated"])
+  # a 304 must carry the same validators the 200 would, so build the headers once for both branches
+  cache_headers = {"ETag": etag, "Last-Modified": formatdate(note["date_updated"].timestamp(), usegmt=True)}
+  if http_request.headers.get("if-none-match") == etag:
+    return Response(status_code=304, headers=cache_headers)
+  # setting headers on the injected Response carries them onto the normal JSON response FastAPI builds for us
+  response.headers.update(cache_headers)
+  return note
+
+# 204 No Content is the standard "it worked, nothing to tell you" answer for mutations - no Pydantic validation, no body bytes
+@notes_router.patch("/notes/{note_id}", tags=["Manipulating Notes"], status_code=204)
+async def update_note(note_id: int, new_note_data: NoteIn, db_session_injection: DBSession):
+  await crud.update_note(db_session=db_session_injection, note_id=note_id, updated_note_data=new_note_data)
+  return Response(status_code=204)
+
+@notes_router.delete("/notes/{note_id}", tags=["Manipulating Notes"], status_code=204)
+async def delete_note(note_id: int, db_session_injection: DBSession):
+  await crud.delete_note(db_session=db_session_injection, note_id=note_id)
+  return Response(status_code=204)
 
 
 